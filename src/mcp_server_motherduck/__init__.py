@@ -1,86 +1,211 @@
-import anyio
+import os
+import sys
 import logging
-import click
-from .server import build_application
-from .configs import SERVER_VERSION, SERVER_LOCALHOST, UVICORN_LOGGING_CONFIG
-
-__version__ = SERVER_VERSION
+from typing import Any
 
 logger = logging.getLogger("mcp_server_motherduck")
-logging.basicConfig(
-    level=logging.INFO, format="[motherduck] %(levelname)s - %(message)s"
+
+# ANSI styling for log output, disabled when stderr is not a terminal or NO_COLOR is set
+_COLOR = (
+    not os.environ.get("NO_COLOR") and sys.stderr is not None and sys.stderr.isatty()
 )
+_BOLD = "\033[1m" if _COLOR else ""
+_GREEN = "\033[32m" if _COLOR else ""
+_CYAN = "\033[36m" if _COLOR else ""
+_RESET = "\033[0m" if _COLOR else ""
 
 
-@click.command()
-@click.option("--port", default=8000, help="Port to listen on for SSE")
-@click.option(
-    "--transport",
-    type=click.Choice(["stdio", "sse", "stream"]),
-    default="stdio",
-    help="(Default: `stdio`) Transport type",
-)
-@click.option(
-    "--db-path",
-    default="md:",
-    help="(Default: `md:`) Path to local DuckDB database file or MotherDuck database",
-)
-@click.option(
-    "--motherduck-token",
-    default=None,
-    help="(Default: env var `motherduck_token`) Access token to use for MotherDuck database connections",
-)
-@click.option(
-    "--home-dir",
-    default=None,
-    help="(Default: env var `HOME`) Home directory for DuckDB",
-)
-@click.option(
-    "--saas-mode",
-    is_flag=True,
-    help="Flag for connecting to MotherDuck in SaaS mode",
-)
-@click.option(
-    "--read-only",
-    is_flag=True,
-    help="Flag for connecting to DuckDB in read-only mode. Only supported for local DuckDB databases. Also makes use of short lived connections so multiple MCP clients or other systems can remain active (though each operation must be done sequentially).",
-)
-@click.option(
-    "--json-response",
-    is_flag=True,
-    default=False,
-    help="(Default: `False`) Enable JSON responses instead of SSE streams. Only supported for `stream` transport.",
-)
-def main(
-    port,
-    transport,
-    db_path,
-    motherduck_token,
-    home_dir,
-    saas_mode,
-    read_only,
-    json_response,
-):
+def __getattr__(name: str) -> Any:
+    # Import the server (and thereby DuckDB) only when it is actually needed
+    if name == "build_application":
+        from .server import build_application
+
+        return build_application
+    if name == "__version__":
+        from .configs import SERVER_VERSION
+
+        return SERVER_VERSION
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Set `MCP_EAGER=1` to import everything up front and fail fast on startup
+if os.environ.get("MCP_EAGER") == "1":
+    import duckdb  # noqa: F401
+    from .server import build_application  # noqa: F401
+
+
+_TRANSPORTS = frozenset({"stdio", "sse", "stream"})
+
+# Command line flag -> (keyword argument, value type, default)
+_FLAGS = {
+    "--port": ("port", int, 8000),
+    "--transport": ("transport", str, "stdio"),
+    "--db-path": ("db_path", str, "md:"),
+    "--motherduck-token": ("motherduck_token", str, None),
+    "--home-dir": ("home_dir", str, None),
+    "--saas-mode": ("saas_mode", "flag", False),
+    "--read-only": ("read_only", "flag", False),
+    "--json-response": ("json_response", "flag", False),
+}
+
+_USAGE = "Usage: mcp-server-motherduck [OPTIONS]\n"
+
+_HELP = f"""{_USAGE}
+  Main entry point for the package.
+
+Options:
+  --port INTEGER               Port to listen on for SSE
+  --transport [stdio|sse|stream]
+                               (Default: `stdio`) Transport type
+  --db-path TEXT               (Default: `md:`) Path to local DuckDB database
+                               file or MotherDuck database
+  --motherduck-token TEXT      (Default: env var `motherduck_token`) Access
+                               token to use for MotherDuck database
+                               connections
+  --home-dir TEXT              (Default: env var `HOME`) Home directory for
+                               DuckDB
+  --saas-mode                  Flag for connecting to MotherDuck in SaaS mode
+  --read-only                  Flag for connecting to DuckDB in read-only
+                               mode. Only supported for local DuckDB
+                               databases. Also makes use of short lived
+                               connections so multiple MCP clients or other
+                               systems can remain active (though each
+                               operation must be done sequentially).
+  --json-response              (Default: `False`) Enable JSON responses
+                               instead of SSE streams. Only supported for
+                               `stream` transport.
+  -V, --version                Show the version and exit.
+  -h, --help                   Show this message and exit.
+"""
+
+
+def _usage_error(message: str):
+    sys.stderr.write(
+        f"{_USAGE}Try 'mcp-server-motherduck --help' for help.\n\nError: {message}\n"
+    )
+    sys.exit(2)
+
+
+def _parse_args(argv: list[str]) -> dict[str, Any]:
+    """Parse command line arguments into keyword arguments for the server"""
+    # Answer help/version requests (e.g. IDE introspection) before looking at
+    # anything else
+    if "--help" in argv or "-h" in argv:
+        sys.stdout.write(_HELP)
+        sys.exit(0)
+    if "--version" in argv or "-V" in argv:
+        from .configs import SERVER_VERSION
+
+        sys.stdout.write(f"mcp-server-motherduck {SERVER_VERSION}\n")
+        sys.exit(0)
+
+    opts = {dest: default for dest, _, default in _FLAGS.values()}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        i += 1
+        flag, sep, value = arg.partition("=")
+        spec = _FLAGS.get(flag)
+        if spec is None:
+            _usage_error(f"No such option: {flag}")
+        dest, kind, _ = spec
+
+        if kind == "flag":
+            if sep:
+                _usage_error(f"Option '{flag}' does not take a value.")
+            opts[dest] = True
+            continue
+
+        if not sep:
+            if i >= len(argv):
+                _usage_error(f"Option '{flag}' requires an argument.")
+            value = argv[i]
+            i += 1
+        if kind is int:
+            try:
+                value = int(value)
+            except ValueError:
+                _usage_error(
+                    f"Invalid value for '{flag}': '{value}' is not a valid integer."
+                )
+        opts[dest] = value
+
+    if opts["transport"] not in _TRANSPORTS:
+        _usage_error(
+            f"Invalid value for '--transport': '{opts['transport']}' is not one of 'stdio', 'sse', 'stream'."
+        )
+
+    return opts
+
+
+def _new_event_loop():
+    """Create the stdio event loop, preferring uvloop (winloop on Windows) if installed"""
+    try:
+        if sys.platform == "win32":
+            from winloop import new_event_loop
+        else:
+            from uvloop import new_event_loop
+    except ImportError:
+        import asyncio
+        import time
+
+        loop = asyncio.new_event_loop()
+        # BaseEventLoop.time() only wraps time.monotonic(); skip the extra call
+        # on the scheduler's hot path
+        loop.time = time.monotonic
+        return loop
+    return new_event_loop()
+
+
+def _run_uvicorn(starlette_app, port: int) -> None:
+    """Serve the HTTP transports with uvicorn, skipping its auto-detection"""
+    import importlib.util
+    import uvicorn
+    from .configs import SERVER_LOCALHOST, UVICORN_LOGGING_CONFIG
+
+    config = uvicorn.Config(
+        starlette_app,
+        host=SERVER_LOCALHOST,
+        port=port,
+        log_config=UVICORN_LOGGING_CONFIG,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        http="httptools" if importlib.util.find_spec("httptools") else "h11",
+        lifespan="on",
+        # MCP traffic is already logged by the handlers
+        access_log=False,
+    )
+    uvicorn.Server(config).run()
+
+
+def main(argv: list[str] | None = None):
     """Main entry point for the package."""
+    opts = _parse_args(sys.argv[1:] if argv is None else argv)
+    # Transport settings stay here, the rest is passed on to `build_application`
+    port = opts.pop("port")
+    transport = opts.pop("transport")
+    json_response = opts.pop("json_response")
+
+    logging.basicConfig(
+        level=logging.INFO, format="[motherduck] %(levelname)s - %(message)s"
+    )
 
-    logger.info("🦆 MotherDuck MCP Server v" + SERVER_VERSION)
-    logger.info("Ready to execute SQL queries via DuckDB/MotherDuck")
+    from .configs import SERVER_VERSION, SERVER_LOCALHOST
+    from .server import build_application
 
-    app, init_opts = build_application(
-        db_path=db_path,
-        motherduck_token=motherduck_token,
-        home_dir=home_dir,
-        saas_mode=saas_mode,
-        read_only=read_only,
+    logger.info(
+        "🦆 MotherDuck MCP Server v%s\nReady to execute SQL queries via DuckDB/MotherDuck",
+        SERVER_VERSION,
     )
 
+    app, init_opts = build_application(**opts)
+
     if transport == "sse":
         from mcp.server.sse import SseServerTransport
         from starlette.applications import Starlette
         from starlette.responses import Response
         from starlette.routing import Mount, Route
 
-        logger.info("MCP server initialized in \033[32msse\033[0m mode")
+        logger.info("MCP server initialized in %ssse%s mode", _GREEN, _RESET)
 
         sse = SseServerTransport("/messages/")
 
@@ -92,25 +217,23 @@ def main(
             return Response()
 
         logger.info(
-            f"🦆 Connect to MotherDuck MCP Server at \033[1m\033[36mhttp://{SERVER_LOCALHOST}:{port}/sse\033[0m"
+            "🦆 Connect to MotherDuck MCP Server at %s%shttp://%s:%s/sse%s",
+            _BOLD,
+            _CYAN,
+            SERVER_LOCALHOST,
+            port,
+            _RESET,
         )
 
         starlette_app = Starlette(
-            debug=True,
+            debug=False,
             routes=[
                 Route("/sse", endpoint=handle_sse, methods=["GET"]),
                 Mount("/messages/", app=sse.handle_post_message),
             ],
         )
 
-        import uvicorn
-
-        uvicorn.run(
-            starlette_app,
-            host=SERVER_LOCALHOST,
-            port=port,
-            log_config=UVICORN_LOGGING_CONFIG,
-        )
+        _run_uvicorn(starlette_app, port)
 
     elif transport == "stream":
         from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
@@ -120,7 +243,9 @@ def main(
         from starlette.types import Receive, Scope, Send
         import contextlib
 
-        logger.info("MCP server initialized in \033[32mhttp-streamable\033[0m mode")
+        logger.info(
+            "MCP server initialized in %shttp-streamable%s mode", _GREEN, _RESET
+        )
 
         # Create the session manager with true stateless mode
         session_manager = StreamableHTTPSessionManager(
@@ -144,45 +269,50 @@ def main(
                     yield
                 finally:
                     logger.info(
-                        "🦆 MotherDuck MCP Server in \033[32mhttp-streamable\033[0m mode shutting down"
+                        "🦆 MotherDuck MCP Server in %shttp-streamable%s mode shutting down",
+                        _GREEN,
+                        _RESET,
                     )
 
         logger.info(
-            f"🦆 Connect to MotherDuck MCP Server at \033[1m\033[36mhttp://{SERVER_LOCALHOST}:{port}/mcp\033[0m"
+            "🦆 Connect to MotherDuck MCP Server at %s%shttp://%s:%s/mcp%s",
+            _BOLD,
+            _CYAN,
+            SERVER_LOCALHOST,
+            port,
+            _RESET,
         )
 
         # Create an ASGI application using the transport
         starlette_app = Starlette(
-            debug=True,
+            debug=False,
             routes=[
                 Mount("/mcp", app=handle_streamable_http),
             ],
             lifespan=lifespan,
         )
 
-        import uvicorn
-
-        uvicorn.run(
-            starlette_app,
-            host=SERVER_LOCALHOST,
-            port=port,
-            log_config=UVICORN_LOGGING_CONFIG,
-        )
+        _run_uvicorn(starlette_app, port)
 
     else:
+        import anyio
         from mcp.server.stdio import stdio_server
 
-        logger.info("MCP server initialized in \033[32mstdio\033[0m mode")
+        logger.info("MCP server initialized in %sstdio%s mode", _GREEN, _RESET)
         logger.info("Waiting for client connection")
 
         async def arun():
             async with stdio_server() as (read_stream, write_stream):
                 await app.run(read_stream, write_stream, init_opts)
 
-        anyio.run(arun)
+        anyio.run(
+            arun,
+            backend="asyncio",
+            backend_options={"loop_factory": _new_event_loop},
+        )
         # This will only be reached when the server is shutting down
         logger.info(
-            "🦆 MotherDuck MCP Server in \033[32mstdio\033[0m mode shutting down"
+            "🦆 MotherDuck MCP Server in %sstdio%s mode shutting down", _GREEN, _RESET
         )
 
 
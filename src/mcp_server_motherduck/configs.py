@@ -4,6 +4,11 @@ SERVER_VERSION = "0.6.3"
 
 SERVER_LOCALHOST = "127.0.0.1"
 
+# Passed to every `duckdb.connect` call
+DUCKDB_CONFIG: dict[str, Any] = {
+    "custom_user_agent": f"mcp-server-motherduck/{SERVER_VERSION}",
+}
+
 UVICORN_LOGGING_CONFIG: dict[str, Any] = {
     "version": 1,
     "disable_existing_loggers": False,
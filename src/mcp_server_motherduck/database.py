@@ -1,15 +1,216 @@
+from __future__ import annotations
+
 import os
-import glob
-import duckdb
-from typing import Literal, Optional
-import io
-from contextlib import redirect_stdout
-from tabulate import tabulate
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import re
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Iterator,
+    Literal,
+    TypeVar,
+)
+from urllib.parse import urlencode
 import logging
-from .configs import SERVER_VERSION
+from .configs import DUCKDB_CONFIG
+
+# DuckDB is a large native library, only load it once a connection is opened
+if TYPE_CHECKING:
+    import duckdb
 
 logger = logging.getLogger("mcp_server_motherduck")
 
+_T = TypeVar("_T")
+
+_RENDER_MAX_ROWS = 1000
+_RENDER_MAX_WIDTH = 10000
+# Types whose values are right-aligned, like DuckDB does
+_NUMERIC_TYPE_IDS = frozenset(
+    "tinyint smallint integer bigint hugeint utinyint usmallint uinteger"
+    " ubigint uhugeint float double decimal".split()
+)
+_TRUNCATED_NOTE = (
+    f"Result truncated to the first {_RENDER_MAX_ROWS} rows. "
+    "Add a LIMIT, filter or aggregation to see the rest.\n"
+)
+_EXECUTOR_WORKERS = 4
+_DB_LIST_TTL = 5.0
+_DB_LIST_LIMIT = 20
+_DB_FILE_EXTENSIONS = (".duckdb", ".db", ".duck")
+_DUCKDB_MAGIC = b"DUCK"
+_SPECIAL_PATHS = frozenset({":memory:", "*"})
+# DuckDB's special database names (e.g. `:memory:name`) start with a colon
+_NON_FILE_PREFIX = ":"
+_RESULT_CACHE_TTL = 30.0
+# Functions whose result differs between calls, so queries using them are not cached
+_VOLATILE_RE = re.compile(
+    r"\b(random|setseed|nextval|currval|uuid|gen_random_uuid|uuidv4|uuidv7|now"
+    r"|today|current_date|current_time|current_timestamp|get_current_time"
+    r"|get_current_timestamp|localtime|localtimestamp|transaction_timestamp)\b",
+    re.IGNORECASE,
+)
+# Name and type code of the single column holding the count of changed rows
+_CHANGED_ROWS_COLUMN = ("Count", "NUMBER")
+_MD_TOKEN_ENV = os.environ.get("motherduck_token")
+
+def _env_int(name: str, default: int) -> int:
+    """Read a non-negative integer setting from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r, using %d", name, value, default)
+        return default
+
+
+# Caching results is opt-in, the database may be changed by other processes
+_RESULT_CACHE_SIZE = _env_int("MCP_RESULT_CACHE_SIZE", 0)
+
+
+@functools.lru_cache(maxsize=4)
+def classify_db_path(db_path: str) -> Literal["duckdb", "motherduck"]:
+    """Classify a database path as MotherDuck (`md:`) or local DuckDB"""
+    return "motherduck" if db_path[:3] == "md:" else "duckdb"
+
+
+def _is_cacheable(query: str) -> bool:
+    """Check whether a query is a single SELECT whose result can be reused"""
+    import duckdb
+
+    # Only parse here, without connecting, so cache hits skip the database.
+    # Syntax added by extensions fails to parse and is simply not cached
+    try:
+        statements = duckdb.extract_statements(query)
+    except duckdb.Error:
+        return False
+    return (
+        len(statements) == 1
+        and statements[0].type == duckdb.StatementType.SELECT
+        and _VOLATILE_RE.search(statements[0].query) is None
+    )
+
+
+def _render_table(
+    names: list[str],
+    types: list[str],
+    numeric: list[bool],
+    rows: list[tuple[str | None, ...]],
+) -> str:
+    """Render result rows in the box layout of DuckDB's `show()`"""
+    # Keep each row on a single line, as DuckDB does
+    cells = [
+        [
+            "NULL" if value is None else value.replace("\n", "\\n")[:_RENDER_MAX_WIDTH]
+            for value in row
+        ]
+        for row in rows
+    ]
+    widths = [
+        max(len(name), len(type_), *(len(row[i]) for row in cells))
+        for i, (name, type_) in enumerate(zip(names, types))
+    ]
+
+    def border(left: str, middle: str, right: str) -> str:
+        return left + middle.join("─" * (width + 2) for width in widths) + right
+
+    def line(values: list[str], aligns: list[str]) -> str:
+        return "│" + "│".join(
+            f" {value:{align}{width}} "
+            for value, align, width in zip(values, aligns, widths)
+        ) + "│"
+
+    centered = ["^"] * len(widths)
+    aligns = [">" if is_numeric else "<" for is_numeric in numeric]
+    lines = [
+        border("┌", "┬", "┐"),
+        line(names, centered),
+        line(types, centered),
+        border("├", "┼", "┤"),
+        *(line(row, aligns) for row in cells),
+        border("└", "┴", "┘"),
+    ]
+    if not rows:
+        lines.append("0 rows")
+    return "\n".join(lines) + "\n"
+
+
+def _render_result(
+    names: list[str],
+    types: list[str],
+    numeric: list[bool],
+    rows: list[tuple[str | None, ...]],
+) -> str:
+    """Render up to `_RENDER_MAX_ROWS` rows, noting when more were fetched"""
+    rendered = _render_table(names, types, numeric, rows[:_RENDER_MAX_ROWS])
+    if len(rows) > _RENDER_MAX_ROWS:
+        rendered += _TRUNCATED_NOTE
+    return rendered
+
+
+def _is_duckdb_file(path: str) -> bool:
+    """Check for the `DUCK` magic bytes that follow the checksum in a DuckDB file header"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(12)[8:] == _DUCKDB_MAGIC
+    except OSError:
+        return False
+
+
+def _find_db_files(root: str, limit: int) -> list[str]:
+    """Find database files below root, shallowest first, stopping after `limit` matches.
+
+    Walks the tree once, breadth-first, with os.scandir. Like a recursive
+    glob it skips hidden files and directories and follows symlinked
+    directories, but never into a directory it is already inside of.
+    """
+    found = []
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        return found
+    # Each directory is queued with the (device, inode) of itself and its
+    # ancestors, so symlink loops are not followed
+    pending = collections.deque(
+        [(root, frozenset({(root_stat.st_dev, root_stat.st_ino)}))]
+    )
+    while pending:
+        path, ancestors = pending.popleft()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir():
+                    stat = entry.stat()
+                    key = (stat.st_dev, stat.st_ino)
+                    if key not in ancestors:
+                        pending.append((entry.path, ancestors | {key}))
+                    continue
+            except OSError:
+                continue
+            if entry.name.endswith(_DB_FILE_EXTENSIONS):
+                # `.db` is mostly used by SQLite, so check those for DuckDB's header
+                if entry.name.endswith(".db") and not _is_duckdb_file(entry.path):
+                    continue
+                found.append(entry.path)
+                if len(found) >= limit:
+                    return found
+    return found
+
 
 class DatabaseClient:
     def __init__(
@@ -22,6 +223,31 @@ class DatabaseClient:
         self._read_only = read_only
         self._motherduck_token = motherduck_token
         self._saas_mode = saas_mode
+        # Connection string suffix for `md:` paths, None without a token
+        token = motherduck_token or _MD_TOKEN_ENV
+        self._md_suffix = None
+        if token:
+            params = {"motherduck_token": token}
+            if saas_mode:
+                params["saas_mode"] = "true"
+            self._md_suffix = f"?{urlencode(params)}"
+        # Resolved connection strings, keyed by database path
+        self._resolved: dict[str, tuple[str, Literal["duckdb", "motherduck"]]] = {}
+        # Open connections, kept for the lifetime of the process (see `_connection`)
+        self._conns: dict[tuple[str, bool], duckdb.DuckDBPyConnection] = {}
+        self._conns_lock = threading.Lock()
+        # (cwd, time.monotonic() timestamp, listing) of the last database listing
+        self._db_list_cache: tuple[str, float, str] | None = None
+        # (time.monotonic() timestamp, formatted result) of recent read
+        # queries, keyed by (db_path, query)
+        self._result_cache: collections.OrderedDict[
+            tuple[str, str], tuple[float, str]
+        ] = collections.OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        # Worker threads for blocking calls made from the async MCP handlers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=_EXECUTOR_WORKERS, thread_name_prefix="motherduck"
+        )
         
         # Set the home directory for DuckDB
         if home_dir:
@@ -29,139 +255,302 @@ class DatabaseClient:
 
         logger.info("Database client initialized for dynamic connections")
 
+    def run_in_executor(self, func: Callable[..., _T], *args: Any) -> Awaitable[_T]:
+        """Run a blocking client call on the client's worker threads"""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
     def _connect_to_database(self, db_path: str) -> duckdb.DuckDBPyConnection:
         """Create a connection to the specified database"""
-        db_path, db_type = self._resolve_db_path_type(db_path, self._motherduck_token, self._saas_mode)
+        db_path, db_type = self._resolve_db_path_type(db_path)
         
-        logger.info(f"🔌 Connecting to {db_type} database: {db_path}")
+        logger.info("🔌 Connecting to %s database: %s", db_type, db_path)
+
+        import duckdb
         
         conn = duckdb.connect(
             db_path,
-            config={"custom_user_agent": f"mcp-server-motherduck/{SERVER_VERSION}"},
+            config=DUCKDB_CONFIG,
             read_only=self._read_only,
         )
 
-        logger.info(f"✅ Successfully connected to {db_type} database")
+        logger.info("✅ Successfully connected to %s database", db_type)
         
         return conn
 
     def _resolve_db_path_type(
-        self, db_path: str, motherduck_token: str | None = None, saas_mode: bool = False
+        self, db_path: str
+    ) -> tuple[str, Literal["duckdb", "motherduck"]]:
+        """Resolve and validate the database path, cached per path"""
+        resolved = self._resolved.get(db_path)
+        if resolved is None:
+            resolved = self._resolved[db_path] = self._resolve_uncached(db_path)
+        return resolved
+
+    def _resolve_uncached(
+        self, db_path: str
     ) -> tuple[str, Literal["duckdb", "motherduck"]]:
         """Resolve and validate the database path"""
         # Handle MotherDuck paths
-        if db_path.startswith("md:"):
-            if motherduck_token:
+        if classify_db_path(db_path) == "motherduck":
+            if self._md_suffix is None:
+                raise ValueError(
+                    "Please set the `motherduck_token` as an environment variable or pass it as an argument with `--motherduck-token` when using `md:` as db_path."
+                )
+            if self._motherduck_token:
                 logger.info("Using MotherDuck token to connect to database `md:`")
-                if saas_mode:
-                    logger.info("Connecting to MotherDuck in SaaS mode")
-                    return (
-                        f"{db_path}?motherduck_token={motherduck_token}&saas_mode=true",
-                        "motherduck",
-                    )
-                else:
-                    return (
-                        f"{db_path}?motherduck_token={motherduck_token}",
-                        "motherduck",
-                    )
-            elif os.getenv("motherduck_token"):
+            else:
                 logger.info(
                     "Using MotherDuck token from env to connect to database `md:`"
                 )
-                return (
-                    f"{db_path}?motherduck_token={os.getenv('motherduck_token')}",
-                    "motherduck",
-                )
-            else:
-                raise ValueError(
-                    "Please set the `motherduck_token` as an environment variable or pass it as an argument with `--motherduck-token` when using `md:` as db_path."
-                )
-
-        if db_path == ":memory:":
-            return db_path, "duckdb"
+            if self._saas_mode:
+                logger.info("Connecting to MotherDuck in SaaS mode")
+            return db_path + self._md_suffix, "motherduck"
 
         return db_path, "duckdb"
 
+    def _get_connection(self, db_path: str) -> duckdb.DuckDBPyConnection:
+        """Return the cached connection for a database, connecting on first use"""
+        key = (db_path, self._read_only)
+        conn = self._conns.get(key)
+        if conn is None:
+            with self._conns_lock:
+                conn = self._conns.get(key)
+                if conn is None:
+                    conn = self._connect_to_database(db_path)
+                    self._conns[key] = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self, db_path: str) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Connect to a database for the duration of a call.
+
+        Local files in read-only mode get a short-lived connection, so that
+        other processes (e.g. dbt) can open the file for writing in between
+        queries. All other connections are cached.
+        """
+        if not self._read_only or classify_db_path(db_path) == "motherduck":
+            yield self._get_connection(db_path)
+            return
+
+        conn = self._connect_to_database(db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+            logger.info("🔌 Closed connection to database")
+
+    def close_all(self) -> None:
+        """Close all cached connections"""
+        with self._conns_lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+        for conn in conns:
+            conn.close()
+        if conns:
+            logger.info("🔌 Closed %d database connection(s)", len(conns))
+
     def _execute(self, query: str, db_path: str) -> str:
         """Execute a query on the specified database"""
-        conn = None
-        try:
-            conn = self._connect_to_database(db_path)
-            q = conn.execute(query)
-            
-            out = tabulate(
-                q.fetchall(),
-                headers=[d[0] + "\n" + d[1] for d in q.description],
-                tablefmt="pretty",
+        import duckdb
+
+        # A cursor per query lets concurrent queries share a cached connection
+        # without being serialized on it
+        with self._connection(db_path) as conn:
+            cur = conn.cursor()
+            try:
+                statements = cur.extract_statements(query)
+                if not statements:
+                    return "Query executed successfully"
+
+                # Anything but a SELECT may change what cached results show
+                is_write = any(
+                    statement.type != duckdb.StatementType.SELECT
+                    for statement in statements
+                )
+                if is_write:
+                    self._clear_result_cache()
+                try:
+                    return self._run(cur, statements)
+                finally:
+                    # Also drop results cached by reads that ran concurrently
+                    if is_write:
+                        self._clear_result_cache()
+            finally:
+                cur.close()
+
+    def _run(
+        self, cur: duckdb.DuckDBPyConnection, statements: list[duckdb.Statement]
+    ) -> str:
+        """Run parsed statements on a cursor and format the result of the last one"""
+        import duckdb
+
+        *leading, last = statements
+        for statement in leading:
+            cur.execute(statement)
+
+        # `sql()` discards the affected row count of INSERT, UPDATE,
+        # DELETE, ..., so run those directly. Whether they produced a count or,
+        # with RETURNING, a result set shows in the schema of the result
+        if duckdb.ExpectedResultType.CHANGED_ROWS in last.expected_result_type:
+            cur.execute(last)
+            description = cur.description
+            if description is None:
+                return "Query executed successfully"
+            if [column[:2] for column in description] == [_CHANGED_ROWS_COLUMN]:
+                row = cur.fetchone()
+                if row is None:
+                    return "Query executed successfully"
+                return f"Query executed successfully ({row[0]} rows affected)"
+
+            rows = cur.fetchmany(_RENDER_MAX_ROWS + 1)
+            return _render_result(
+                [column[0] for column in description],
+                [str(column[1]).lower() for column in description],
+                [column[1] == "NUMBER" for column in description],
+                [
+                    tuple(None if value is None else str(value) for value in row)
+                    for row in rows
+                ],
             )
-            
-            return out
-            
-        finally:
-            if conn:
-                conn.close()
-                logger.info(f"🔌 Closed connection to database")
+
+        rel = cur.sql(last)
+        if rel is None:
+            # Statements without a result set (SET, ATTACH, ...) run eagerly
+            return "Query executed successfully"
+
+        # Let DuckDB convert the values to text so they read like its own
+        # output, then draw the table from the fetched rows. The LIMIT is part
+        # of the plan, so DuckDB stops producing rows once enough are fetched;
+        # the one extra row tells whether the result was cut off
+        rows = (
+            rel.limit(_RENDER_MAX_ROWS + 1)
+            .project("CAST(COLUMNS(*) AS VARCHAR)")
+            .fetchall()
+        )
+        return _render_result(
+            rel.columns,
+            [str(type_).lower() for type_ in rel.types],
+            [type_.id in _NUMERIC_TYPE_IDS for type_ in rel.types],
+            rows,
+        )
+
+    def _get_cached_result(self, key: tuple[str, str]) -> str | None:
+        """Return a cached result that has not expired yet"""
+        with self._result_cache_lock:
+            entry = self._result_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= _RESULT_CACHE_TTL:
+                del self._result_cache[key]
+                return None
+            self._result_cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_result(self, key: tuple[str, str], result: str) -> None:
+        """Store a result, evicting the least recently used ones"""
+        with self._result_cache_lock:
+            self._result_cache[key] = (time.monotonic(), result)
+            self._result_cache.move_to_end(key)
+            while len(self._result_cache) > _RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+
+    def _clear_result_cache(self) -> None:
+        """Drop all cached results"""
+        with self._result_cache_lock:
+            self._result_cache.clear()
 
     def query(self, query: str, db_path: str = ":memory:") -> str:
-        """Execute a query on the specified database path"""
+        """Execute a query on the specified database path.
+
+        With `MCP_RESULT_CACHE_SIZE` set, results of single SELECT queries
+        are kept for a short time in an LRU cache keyed by the database path
+        and query text. Any other statement clears the cache.
+        """
+        key = None
+        if _RESULT_CACHE_SIZE > 0 and _is_cacheable(query):
+            key = (db_path, query.strip())
+            cached = self._get_cached_result(key)
+            if cached is not None:
+                return cached
+
         try:
-            return self._execute(query, db_path)
+            result = self._execute(query, db_path)
         except Exception as e:
             raise ValueError(f"❌ Error executing query: {e}")
+
+        if key is not None:
+            self._cache_result(key, result)
+        return result
     
     def list_available_databases(self) -> str:
         """List available databases including MotherDuck and local files"""
+        # Reuse a recent listing of the same directory instead of re-walking it
+        cwd = os.getcwd()
+        now = time.monotonic()
+        cached = self._db_list_cache
+        if cached and cached[0] == cwd and now - cached[1] < _DB_LIST_TTL:
+            return cached[2]
+
         databases = []
         
         # Check for MotherDuck availability
-        if self._motherduck_token or os.getenv("motherduck_token"):
+        if self._md_suffix is not None:
             databases.append("📡 MotherDuck:\n  - md: (default MotherDuck database)\n  - md:database_name (specific MotherDuck database)")
         
         # Check for local DuckDB files
         databases.append("\n💾 Local options:\n  - :memory: (in-memory database)")
         
         # Look for DuckDB files recursively in current directory
-        cwd = os.getcwd()
-        patterns = ["*.duckdb", "*.db", "*.duck"]
-        found_dbs = []
-        
-        for pattern in patterns:
-            # Recursive search using ** glob pattern
-            found_dbs.extend(glob.glob(os.path.join(cwd, "**", pattern), recursive=True))
+        found_dbs = _find_db_files(cwd, _DB_LIST_LIMIT + 1)
         
         if found_dbs:
-            # Sort by path depth (files in current dir first) and then alphabetically
-            found_dbs.sort(key=lambda x: (x.count(os.sep), x))
             databases.append("\n📁 Local DuckDB files found:")
-            for db_file in found_dbs[:20]:  # Limit to first 20 to avoid overwhelming output
+            for db_file in found_dbs[:_DB_LIST_LIMIT]:  # Limit to avoid overwhelming output
                 rel_path = os.path.relpath(db_file, cwd)
                 databases.append(f"  - {rel_path}")
             
-            if len(found_dbs) > 20:
-                databases.append(f"  ... and {len(found_dbs) - 20} more files")
+            if len(found_dbs) > _DB_LIST_LIMIT:
+                databases.append("  ... and more files")
         
-        return "\n".join(databases)
+        listing = "\n".join(databases)
+        self._db_list_cache = (cwd, now, listing)
+        return listing
     
     def validate_database_path(self, db_path: str) -> bool:
         """Validate that a database path is accessible"""
         # Special paths that are always valid
-        if db_path in [":memory:", "*"]:
+        if db_path in _SPECIAL_PATHS:
             return True
         
         # MotherDuck paths
-        if db_path.startswith("md:"):
-            if not (self._motherduck_token or os.getenv("motherduck_token")):
+        if classify_db_path(db_path) == "motherduck":
+            if self._md_suffix is None:
                 raise ValueError("MotherDuck token required for md: paths. Set motherduck_token environment variable or pass --motherduck-token")
             return True
         
-        # Local file paths
-        if os.path.exists(db_path):
-            return True
+        # Local paths are validated by connecting. DuckDB refuses missing files
+        # in read-only mode, otherwise connecting would create a new file, so
+        # rule out obvious typos first. Paths that are not files, such as
+        # named in-memory databases (`:memory:name`) and remote paths
+        # (`s3://...`), are left to DuckDB. DuckDB expands `~` itself, so do
+        # the same here
+        local_path = os.path.expanduser(db_path)
+        if (
+            not self._read_only
+            and not db_path.startswith(_NON_FILE_PREFIX)
+            and "://" not in db_path
+            and not os.path.exists(local_path)
+        ):
+            parent = os.path.dirname(local_path) or "."
+            if not os.path.isdir(parent):
+                raise ValueError(f"Cannot access database at '{db_path}': directory '{parent}' does not exist")
+            if not db_path.endswith(_DB_FILE_EXTENSIONS):
+                raise ValueError(f"Cannot access database at '{db_path}': expected a file ending in {', '.join(_DB_FILE_EXTENSIONS)}")
         
-        # Try to create a test connection to validate
+        # Connect to validate, keeping a cacheable connection for the queries
+        # that follow (nothing is cached if connecting fails)
         try:
-            conn = self._connect_to_database(db_path)
-            conn.close()
-            return True
+            with self._connection(db_path):
+                return True
         except Exception as e:
             raise ValueError(f"Cannot access database at '{db_path}': {str(e)}")
@@ -1,16 +1,106 @@
+import asyncio
+import atexit
+import functools
 import logging
 from pydantic import AnyUrl
-from typing import Literal
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
 from mcp.server.models import InitializationOptions
 from .configs import SERVER_VERSION
-from .database import DatabaseClient
+from .database import DatabaseClient, classify_db_path
 from .prompt import PROMPT_TEMPLATE
 
 
 logger = logging.getLogger("mcp_server_motherduck")
 
+_READ_ONLY_QUERY_CONCURRENCY = 4
+# Maximum number of characters of tool arguments (e.g. SQL) written to the log
+_LOG_TRUNC = 60
+
+# Tool and prompt definitions are immutable, so build the models only once
+_INITIAL_PROMPT = types.Prompt(
+    name="duckdb-motherduck-initial-prompt",
+    description="A prompt to initialize a connection to duckdb or motherduck and start working with it",
+)
+_PROMPTS = [_INITIAL_PROMPT]
+_INITIAL_PROMPT_RESULT = types.GetPromptResult(
+    description="Initial prompt for interacting with DuckDB/MotherDuck",
+    messages=[
+        types.PromptMessage(
+            role="user",
+            content=types.TextContent(type="text", text=PROMPT_TEMPLATE),
+        )
+    ],
+)
+
+_STATIC_TOOLS = (
+    types.Tool(
+        name="list_databases",
+        description="List available databases including MotherDuck databases and local DuckDB files",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+    types.Tool(
+        name="set_database",
+        description="Set the database path for future queries",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "db_path": {
+                    "type": "string",
+                    "description": "The database path to set as (e.g., 'md:', ':memory:', 'path/to/database.db')",
+                },
+            },
+            "required": ["db_path"],
+        },
+    ),
+    types.Tool(
+        name="get_database",
+        description="Get the current database path",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        },
+    ),
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _query_tool(current_db_path: str) -> types.Tool:
+    """Build the query tool, whose description names the current database"""
+    return types.Tool(
+        name="query",
+        description="Use this to execute a query on the MotherDuck or DuckDB database",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "SQL query to execute that is a dialect of DuckDB SQL",
+                },
+                "db_path": {
+                    "type": "string",
+                    "description": f"Path to the database (e.g., ':memory:', 'path/to/database.db', 'md:my_database'). Defaults to '{current_db_path}' if not specified.",
+                },
+            },
+            "required": ["query"],
+        },
+    )
+
+
+def _initialization_options(server: Server) -> InitializationOptions:
+    """Build the initialization options, including the server's capabilities"""
+    return InitializationOptions(
+        server_name="motherduck",
+        server_version=SERVER_VERSION,
+        capabilities=server.get_capabilities(
+            notification_options=NotificationOptions(),
+            experimental_capabilities={},
+        ),
+    )
+
 
 def build_application(
     db_path: str | None = None,
@@ -22,13 +112,20 @@ def build_application(
     logger.info("Starting MotherDuck MCP Server with dynamic database support")
     server = Server("mcp-server-motherduck")
     current_db_path = db_path if db_path else "md:"
+    logger.info(
+        "Default database: %s (%s)", current_db_path, classify_db_path(current_db_path)
+    )
     db_client = DatabaseClient(
         motherduck_token=motherduck_token,
         home_dir=home_dir,
         saas_mode=saas_mode,
         read_only=read_only,
     )
-    
+    atexit.register(db_client.close_all)
+    # DuckDB allows a single writer, so only read-only mode runs queries concurrently
+    query_semaphore = asyncio.Semaphore(
+        _READ_ONLY_QUERY_CONCURRENCY if read_only else 1
+    )
 
     logger.info("Registering handlers")
 
@@ -47,7 +144,7 @@ def build_application(
         Read a specific note's content by its URI.
         The note name is extracted from the URI host component.
         """
-        logger.info(f"Reading resource: {uri}")
+        logger.info("Reading resource: %s", uri)
         raise ValueError(f"Unsupported URI scheme: {uri.scheme}")
 
     @server.list_prompts()
@@ -59,12 +156,7 @@ def build_application(
         logger.info("Listing prompts")
         # TODO: Check where and how this is used, and how to optimize this.
         # Check postgres and sqlite servers.
-        return [
-            types.Prompt(
-                name="duckdb-motherduck-initial-prompt",
-                description="A prompt to initialize a connection to duckdb or motherduck and start working with it",
-            )
-        ]
+        return _PROMPTS
 
     @server.get_prompt()
     async def handle_get_prompt(
@@ -74,21 +166,13 @@ def build_application(
         Generate a prompt by combining arguments with server state.
         The prompt includes all current notes and can be customized via arguments.
         """
-        logger.info(f"Getting prompt: {name}::{arguments}")
+        logger.info("Getting prompt: %s::%s", name, arguments)
         # TODO: Check where and how this is used, and how to optimize this.
         # Check postgres and sqlite servers.
-        if name != "duckdb-motherduck-initial-prompt":
+        if name != _INITIAL_PROMPT.name:
             raise ValueError(f"Unknown prompt: {name}")
 
-        return types.GetPromptResult(
-            description="Initial prompt for interacting with DuckDB/MotherDuck",
-            messages=[
-                types.PromptMessage(
-                    role="user",
-                    content=types.TextContent(type="text", text=PROMPT_TEMPLATE),
-                )
-            ],
-        )
+        return _INITIAL_PROMPT_RESULT
 
     @server.list_tools()
     async def handle_list_tools() -> list[types.Tool]:
@@ -98,56 +182,7 @@ def build_application(
         """
         nonlocal current_db_path
         logger.info("Listing tools")
-        return [
-            types.Tool(
-                name="query",
-                description="Use this to execute a query on the MotherDuck or DuckDB database",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "SQL query to execute that is a dialect of DuckDB SQL",
-                        },
-                        "db_path": {
-                            "type": "string",
-                            "description": f"Path to the database (e.g., ':memory:', 'path/to/database.db', 'md:my_database'). Defaults to '{current_db_path}' if not specified.",
-                        },
-                    },
-                    "required": ["query"],
-                },
-            ),
-            types.Tool(
-                name="list_databases",
-                description="List available databases including MotherDuck databases and local DuckDB files",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-            ),
-            types.Tool(
-                name="set_database",
-                description="Set the database path for future queries",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "db_path": {
-                            "type": "string",
-                            "description": "The database path to set as (e.g., 'md:', ':memory:', 'path/to/database.db')",
-                        },
-                    },
-                    "required": ["db_path"],
-                },
-            ),
-            types.Tool(
-                name="get_database",
-                description="Get the current database path",
-                inputSchema={
-                    "type": "object",
-                    "properties": {},
-                },
-            ),
-        ]
+        return [_query_tool(current_db_path), *_STATIC_TOOLS]
 
     @server.call_tool()
     async def handle_tool_call(
@@ -158,20 +193,33 @@ def build_application(
         Tools can modify server state and notify clients of changes.
         """
         nonlocal current_db_path
-        logger.info(f"Calling tool: {name}::{arguments}")
+        logger.info("Calling tool: %s::%.*s", name, _LOG_TRUNC, arguments)
         try:
             if name == "query":
                 if arguments is None:
                     return [
                         types.TextContent(type="text", text="Error: No query provided")
                     ]
-                query = arguments["query"]
+                query = arguments.get("query", "")
+                if not isinstance(query, str):
+                    return [
+                        types.TextContent(
+                            type="text", text="Error: query must be a string"
+                        )
+                    ]
+                if not query.strip():
+                    return [types.TextContent(type="text", text="Error: Empty query")]
                 db_path = arguments.get("db_path", current_db_path)
-                tool_response = db_client.query(query, db_path)
-                return [types.TextContent(type="text", text=str(tool_response))]
+                async with query_semaphore:
+                    tool_response = await db_client.run_in_executor(
+                        db_client.query, query, db_path
+                    )
+                return [types.TextContent(type="text", text=tool_response)]
             
             elif name == "list_databases":
-                databases = db_client.list_available_databases()
+                databases = await db_client.run_in_executor(
+                    db_client.list_available_databases
+                )
                 return [types.TextContent(type="text", text=databases)]
             
             elif name == "set_database":
@@ -182,7 +230,9 @@ def build_application(
                 new_path = arguments["db_path"]
                 # Validate the path is accessible
                 try:
-                    db_client.validate_database_path(new_path)
+                    await db_client.run_in_executor(
+                        db_client.validate_database_path, new_path
+                    )
                     current_db_path = new_path
                     return [types.TextContent(
                         type="text", 
@@ -203,16 +253,7 @@ def build_application(
             return [types.TextContent(type="text", text=f"Unsupported tool: {name}")]
 
         except Exception as e:
-            logger.error(f"Error executing tool {name}: {e}")
+            logger.error("Error executing tool %s: %s", name, e)
             raise ValueError(f"Error executing tool {name}: {str(e)}")
 
-    initialization_options = InitializationOptions(
-        server_name="motherduck",
-        server_version=SERVER_VERSION,
-        capabilities=server.get_capabilities(
-            notification_options=NotificationOptions(),
-            experimental_capabilities={},
-        ),
-    )
-
-    return server, initialization_options
+    return server, _initialization_options(server)
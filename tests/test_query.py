@@ -0,0 +1,67 @@
+import re
+
+import pytest
+
+from mcp_server_motherduck import database
+from mcp_server_motherduck.database import DatabaseClient
+
+
+@pytest.fixture
+def client():
+    client = DatabaseClient()
+    yield client
+    client.close_all()
+
+
+@pytest.mark.parametrize(
+    "rows, truncated",
+    [
+        (database._RENDER_MAX_ROWS, False),
+        (database._RENDER_MAX_ROWS + 1, True),
+    ],
+)
+def test_truncation_note(client, rows, truncated):
+    result = client.query(f"SELECT * FROM range({rows})")
+    assert result.endswith(database._TRUNCATED_NOTE) == truncated
+
+
+def test_truncated_query_runs_once(client):
+    client.query("CREATE SEQUENCE s")
+    client.query(f"SELECT nextval('s') FROM range({database._RENDER_MAX_ROWS * 3})")
+    currval = client.query("SELECT currval('s')")
+    assert re.search(rf"│ +{database._RENDER_MAX_ROWS + 1} │", currval)
+
+
+@pytest.mark.parametrize(
+    "query, affected",
+    [
+        ("INSERT INTO log VALUES (1), (2)", 2),
+        ("UPDATE log SET i = 0", 2),
+        ("UPDATE log SET i = 0 WHERE 'returning' <> ''", 2),
+        ("DELETE FROM log WHERE i = 1", 1),
+    ],
+)
+def test_changed_rows_are_counted(client, query, affected):
+    client.query("CREATE TABLE log AS SELECT * FROM range(1, 3) r(i)")
+    assert client.query(query) == (
+        f"Query executed successfully ({affected} rows affected)"
+    )
+
+
+def test_returning_renders_result_set(client):
+    client.query("CREATE TABLE log (i INTEGER)")
+    result = client.query("INSERT INTO log VALUES (7) RETURNING i")
+    assert re.search(r"│ +7 │", result)
+
+
+@pytest.mark.parametrize("db_path", [":memory:", ":memory:named", "~/home.duckdb"])
+def test_validate_database_path_accepts_non_file_and_home_paths(
+    client, db_path, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert client.validate_database_path(db_path)
+
+
+def test_validate_database_path_rejects_unknown_extension(client, tmp_path):
+    with pytest.raises(ValueError, match="expected a file ending in"):
+        client.validate_database_path(str(tmp_path / "notes.txt"))
@@ -0,0 +1,86 @@
+import pytest
+
+from mcp_server_motherduck import database
+from mcp_server_motherduck.database import DatabaseClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(database, "_RESULT_CACHE_SIZE", 8)
+    client = DatabaseClient()
+    client.query("CREATE TABLE t AS SELECT 1 AS a")
+    yield client
+    client.close_all()
+
+
+def count(client: DatabaseClient) -> str:
+    return client.query("SELECT count(*) FROM t")
+
+
+def test_repeated_select_is_served_from_cache(client):
+    first = count(client)
+    client._get_connection(":memory:").execute("INSERT INTO t VALUES (2)")
+    assert count(client) == first
+
+
+@pytest.mark.parametrize(
+    "write",
+    [
+        "INSERT INTO t VALUES (2)",
+        "WITH x AS (SELECT 2) INSERT INTO t SELECT * FROM x",
+        "/* c */ INSERT INTO t VALUES (2)",
+        "EXPLAIN ANALYZE INSERT INTO t VALUES (2)",
+        "SELECT 1; INSERT INTO t VALUES (2)",
+    ],
+)
+def test_writes_invalidate_cache(client, write):
+    assert "│            1 │" in count(client)
+    client.query(write)
+    assert "│            2 │" in count(client)
+
+
+def test_multi_statement_query_is_never_cached(client):
+    client.query("SELECT 1; INSERT INTO t VALUES (2)")
+    client.query("SELECT 1; INSERT INTO t VALUES (2)")
+    assert "│            3 │" in count(client)
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["SELECT random()", "SELECT nextval('s')", "SELECT now()"],
+)
+def test_volatile_queries_are_not_cached(client, query):
+    client.query("CREATE SEQUENCE s")
+    client.query(query)
+    assert not client._result_cache
+
+
+def test_cached_results_expire(client, monkeypatch):
+    monkeypatch.setattr(database, "_RESULT_CACHE_TTL", 0.0)
+    count(client)
+    client._get_connection(":memory:").execute("INSERT INTO t VALUES (2)")
+    assert "│            2 │" in count(client)
+
+
+def test_cache_hit_does_not_connect(client, monkeypatch):
+    first = count(client)
+
+    def connection(db_path):
+        raise AssertionError("connected on a cache hit")
+
+    monkeypatch.setattr(client, "_connection", connection)
+    assert count(client) == first
+
+
+def test_disabled_cache_reruns_queries(client, monkeypatch):
+    monkeypatch.setattr(database, "_RESULT_CACHE_SIZE", 0)
+    count(client)
+    client._get_connection(":memory:").execute("INSERT INTO t VALUES (2)")
+    assert "│            2 │" in count(client)
+    assert not client._result_cache
+
+
+@pytest.mark.parametrize("value", ["lots", "1.5", ""])
+def test_invalid_cache_size_falls_back_to_default(monkeypatch, value):
+    monkeypatch.setenv("MCP_RESULT_CACHE_SIZE", value)
+    assert database._env_int("MCP_RESULT_CACHE_SIZE", 0) == 0